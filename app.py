@@ -11,10 +11,11 @@ import time
 import logging
 import signal
 import faulthandler
+import importlib
 import sqlite3
 import secrets
 from collections import deque
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict
 
 import task_runtime as tr
 import mediawall_runtime as mw
@@ -60,6 +61,7 @@ app.logger.info(f"  Debug Requests: {DEBUG_REQUEST_TIMING}")
 app.logger.info(f"  Debug FS: {DEBUG_FS_TIMING}")
 app.logger.info(f"  Login Required: {cfg.login_required}")
 app.logger.info(f"  Media Wall Enabled: {cfg.media_wall_enabled}")
+app.logger.info(f"  Task Runner Workers: {cfg.task_runner_workers}")
 
 # ---------------------------------------------------------------------
 # Base data directories (shared with scheduler)
@@ -84,10 +86,11 @@ os.environ["CONFIG_DIR"] = CONFIG_ROOT
 os.environ["DOWNLOADS_DIR"] = DOWNLOADS_ROOT
 
 # Re-import to pick up updated environment
-import importlib
 importlib.reload(tr)
 importlib.reload(mw)
 
+tr.configure_task_runner(workers=cfg.task_runner_workers)
+
 # Update references
 TASKS_ROOT = tr.TASKS_ROOT
 CONFIG_ROOT = tr.CONFIG_ROOT
@@ -115,6 +118,7 @@ MEDIA_WALL_CACHE_VIDEOS = cfg.media_wall_cache_videos
 MEDIA_WALL_COPY_LIMIT = cfg.media_wall_copy_limit
 MEDIA_WALL_AUTO_INGEST_ON_TASK_END = cfg.media_wall_auto_ingest_on_task_end
 MEDIA_WALL_AUTO_REFRESH_ON_TASK_END = cfg.media_wall_auto_refresh_on_task_end
+RUN_LOG_RETENTION = cfg.run_log_retention
 MEDIA_WALL_MIN_REFRESH_SECONDS = cfg.media_wall_min_refresh_seconds
 
 # ---------------------------------------------------------------------
@@ -154,13 +158,32 @@ def _utcnow() -> str:
     return dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds").replace("+00:00", "") + "Z"
 
 
+SLUG_WHITESPACE_RE = re.compile(r"\s+")
+SLUG_INVALID_RE = re.compile(r"[^a-z0-9-]+")
+# Task folder names that could escape TASKS_ROOT: leading dot ("..", hidden),
+# path separators ("/" and "\\", covering os.sep), or NUL. Anything else
+# load_tasks() lists stays manageable from the UI.
+TASK_SLUG_INVALID_RE = re.compile(r"\A\.|[/\\\x00]")
+
+
 def slugify(name: str) -> str:
     name = name.strip().lower()
-    name = re.sub(r"\s+", "-", name)
-    name = re.sub(r"[^a-z0-9-]+", "", name)
+    name = SLUG_WHITESPACE_RE.sub("-", name)
+    name = SLUG_INVALID_RE.sub("", name)
     return name or "task"
 
 
+def _task_folder(slug: str) -> Optional[str]:
+    """Map a URL slug to its task folder, or None if it could escape TASKS_ROOT.
+
+    TASKS_ROOT is already resolved at startup, so a denylist match on the
+    slug is enough; no per-request resolve()/realpath() is needed.
+    """
+    if not slug or TASK_SLUG_INVALID_RE.search(slug):
+        return None
+    return os.path.join(TASKS_ROOT, slug)
+
+
 ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
 
 
@@ -308,37 +331,52 @@ def write_text(path: str, content: str):
 
 def _latest_run_log_path(task_dir: str) -> Optional[str]:
     logs_dir = os.path.join(task_dir, "logs")
-    if not os.path.isdir(logs_dir):
-        return None
     try:
         newest = None
-        for entry in os.scandir(logs_dir):
-            if not entry.is_file():
-                continue
-            name = entry.name
-            if not (name.startswith("run_") and name.endswith(".log")):
-                continue
-            if newest is None or name > newest:
-                newest = name
+        with os.scandir(logs_dir) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                name = entry.name
+                if not (name.startswith("run_") and name.endswith(".log")):
+                    continue
+                if newest is None or name > newest:
+                    newest = name
         return os.path.join(logs_dir, newest) if newest else None
     except Exception:
         return None
 
 
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
 def _tail_lines_bounded(path: str, lines: int = 50, *, max_bytes: int = 2_000_000) -> str:
-    """Read the last N lines efficiently (bounded by max_bytes)."""
+    """Read the last N lines efficiently (bounded by max_bytes).
+
+    Reads backwards in 64 KiB blocks and stops as soon as enough lines are
+    buffered, so large logs cost a couple of reads instead of max_bytes.
+    """
+    want = int(lines)
     try:
         with open(path, "rb") as f:
             f.seek(0, os.SEEK_END)
-            size = f.tell()
-            start = max(0, size - int(max_bytes))
-            f.seek(start)
-            data = f.read()
+            pos = f.tell()
+            floor = max(0, pos - int(max_bytes))
+            blocks = []
+            newlines = 0
+            while pos > floor and newlines <= want:
+                step = min(TAIL_BLOCK_SIZE, pos - floor)
+                pos -= step
+                f.seek(pos)
+                block = f.read(step)
+                blocks.append(block)
+                newlines += block.count(b"\n")
+        data = bytearray().join(reversed(blocks))
         text = data.decode("utf-8", errors="replace")
         parts = text.splitlines()
         if not parts:
             return ""
-        return "\n".join(parts[-int(lines):]) + "\n"
+        return "\n".join(parts[-want:]) + "\n"
     except Exception:
         return ""
 
@@ -355,9 +393,84 @@ def _truncate_line_length(content: str, max_length: int) -> str:
     return "\n".join(out)
 
 
+# Check for gallery-dl error tags: [[error]] or Python exceptions
+# Examples: [download][[error]] Failed to download...
+#           [error] message
+#           Traceback (most recent call last):
+ERROR_LINE_RE = re.compile(
+    r"\[\[error\]\]|\[error\]|^Traceback \(most recent call last\):|^[A-Z]\w*Error:",
+    re.IGNORECASE,
+)
+
+# Per-task incremental scan state for the errors endpoint, so each poll only
+# reads the bytes appended to the run log since the previous poll.
+# _ERROR_SCAN_LOCK only guards the dict itself; each entry carries its own lock
+# so polls for different tasks never wait on each other's file reads.
+_ERROR_SCAN_STATE: Dict[str, dict] = {}
+_ERROR_SCAN_LOCK = threading.Lock()
+
+
+def _scan_run_log_errors(slug: str, run_log_path: str, max_lines: int) -> Tuple[int, list]:
+    """Return (error_count, last max_lines error lines) for a run log.
+
+    Only complete lines are consumed; a trailing partial line is picked up on
+    the next call once its newline has been written.
+    """
+    with _ERROR_SCAN_LOCK:
+        state = _ERROR_SCAN_STATE.get(slug)
+        if state is None:
+            state = {"lock": threading.Lock(), "path": None, "offset": 0, "count": 0, "lines": deque()}
+            _ERROR_SCAN_STATE[slug] = state
+
+    with state["lock"]:
+        size = os.path.getsize(run_log_path)
+        if (
+            state["path"] != run_log_path
+            or state["lines"].maxlen != max_lines
+            or size < state["offset"]
+        ):
+            state["path"] = run_log_path
+            state["offset"] = 0
+            state["count"] = 0
+            state["lines"] = deque(maxlen=max_lines)  # Efficiently maintain last N lines
+
+        if size > state["offset"]:
+            with open(run_log_path, "rb") as f:
+                f.seek(state["offset"])
+                data = f.read(size - state["offset"])
+            end = data.rfind(b"\n") + 1
+            if end:
+                text = data[:end].decode("utf-8", errors="replace")
+                for raw_line in text.splitlines():
+                    line = strip_ansi(raw_line)
+                    if ERROR_LINE_RE.search(line):
+                        state["count"] += 1
+                        state["lines"].append(line.rstrip())
+                state["offset"] += end
+
+        return state["count"], list(state["lines"])
+
+
+# Parsed artillery.conf keyed on its (mtime_ns, size) so polling endpoints
+# don't re-open and re-parse the file on every request.
+_ARTILLERY_CONFIG_CACHE: Dict[str, Tuple[int, int, dict]] = {}
+_ARTILLERY_CONFIG_CACHE_LOCK = threading.Lock()
+
+
 def load_artillery_config() -> dict:
     """Load Artillery configuration settings."""
-    ensure_data_dirs(ensure_downloads=False)
+    try:
+        st = os.stat(ARTILLERY_CONFIG_FILE)
+        sig = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        sig = None
+
+    if sig is not None:
+        with _ARTILLERY_CONFIG_CACHE_LOCK:
+            cached = _ARTILLERY_CONFIG_CACHE.get(ARTILLERY_CONFIG_FILE)
+        if cached is not None and cached[:2] == sig:
+            return dict(cached[2])
+
     config = {
         "log_lines_display": 50,  # default
         "error_lines_display": 20,  # default
@@ -398,6 +511,10 @@ def load_artillery_config() -> dict:
                             config["media_wall_enabled"] = value.lower() in ("true", "1", "yes", "on")
         except Exception as exc:
             app.logger.warning("Failed to load Artillery config: %s", exc)
+        else:
+            if sig is not None:
+                with _ARTILLERY_CONFIG_CACHE_LOCK:
+                    _ARTILLERY_CONFIG_CACHE[ARTILLERY_CONFIG_FILE] = (sig[0], sig[1], dict(config))
     
     return config
 
@@ -421,17 +538,18 @@ def save_artillery_config(config: dict):
     except Exception as exc:
         app.logger.error("Failed to save Artillery config: %s", exc)
         raise
+    finally:
+        with _ARTILLERY_CONFIG_CACHE_LOCK:
+            _ARTILLERY_CONFIG_CACHE.pop(ARTILLERY_CONFIG_FILE, None)
 
 
 def load_tasks():
     ensure_data_dirs(ensure_downloads=False)
 
     tasks = []
-    if not os.path.isdir(TASKS_ROOT):
-        return tasks
-
     try:
-        entries = list(os.scandir(TASKS_ROOT))
+        with os.scandir(TASKS_ROOT) as it:
+            entries = list(it)
     except Exception:
         entries = []
 
@@ -441,20 +559,31 @@ def load_tasks():
 
         slug = entry.name
         task_path = entry.path
-        name = read_text(os.path.join(task_path, "name.txt")) or slug
-        schedule = read_text(os.path.join(task_path, "cron.txt"))
-        command = read_text(os.path.join(task_path, "command.txt")) or "gallery-dl --input-file urls.txt"
-        last_run = read_text(os.path.join(task_path, "last_run.txt"))
-        urls = read_text(os.path.join(task_path, "urls.txt"))
 
-        lock_path = os.path.join(task_path, "lock")
-        paused_path = os.path.join(task_path, "paused")
+        # One directory listing per task instead of an exists()/open() probe per file.
+        try:
+            with os.scandir(task_path) as it:
+                present = {e.name for e in it}
+        except OSError:
+            present = set()
+
+        def _read(filename: str) -> Optional[str]:
+            if filename not in present:
+                return None
+            return read_text(os.path.join(task_path, filename))
+
+        name = _read("name.txt") or slug
+        schedule = _read("cron.txt")
+        command = _read("command.txt") or "gallery-dl --input-file urls.txt"
+        last_run = _read("last_run.txt")
+        urls = _read("urls.txt")
 
         # If paused flag exists, show paused even if a lock is present (running but halted)
-        if os.path.exists(paused_path):
+        if "paused" in present:
             status = "paused"
-        elif os.path.exists(lock_path):
-            status = "running"
+        elif "lock" in present:
+            # Lock held by a run still waiting for a free task runner
+            status = "queued" if tr.is_task_queued(slug) else "running"
         else:
             status = "idle"
 
@@ -639,31 +768,32 @@ def wall_file(filename):
 
 @app.route("/mediawall/api/cache_index")
 def mediawall_cache_index():
-    ensure_data_dirs(ensure_downloads=False)
-
     def _list_dir(d: str):
         items = []
-        if not os.path.isdir(d):
+        try:
+            it = os.scandir(d)
+        except (FileNotFoundError, NotADirectoryError):
             return items
-        for entry in os.scandir(d):
-            if not entry.is_file():
-                continue
-            fn = entry.name
-            if fn.endswith(".tmp"):
-                continue
-            ext = os.path.splitext(fn)[1].lower()
-            if ext not in MEDIA_EXTS:
-                continue
-            try:
-                st = entry.stat()
-            except FileNotFoundError:
-                continue
-            items.append({
-                "name": fn,
-                "mtime": int(st.st_mtime),
-                "size": int(st.st_size),
-                "url": url_for("wall_file", filename=fn),
-            })
+        with it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                fn = entry.name
+                if fn.endswith(".tmp"):
+                    continue
+                ext = os.path.splitext(fn)[1].lower()
+                if ext not in MEDIA_EXTS:
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                items.append({
+                    "name": fn,
+                    "mtime": int(st.st_mtime),
+                    "size": int(st.st_size),
+                    "url": url_for("wall_file", filename=fn),
+                })
         items.sort(key=lambda x: x["mtime"], reverse=True)
         return items
 
@@ -856,6 +986,7 @@ def run_task_background(task_folder: str):
         media_wall_copy_limit=MEDIA_WALL_COPY_LIMIT,
         media_wall_auto_ingest=MEDIA_WALL_AUTO_INGEST_ON_TASK_END,
         media_wall_auto_refresh=MEDIA_WALL_AUTO_REFRESH_ON_TASK_END,
+        run_log_retention=RUN_LOG_RETENTION,
     )
 
 
@@ -863,15 +994,17 @@ def run_task_background(task_folder: str):
 def task_action(slug):
     ensure_data_dirs(ensure_downloads=False)
     action = request.form.get("action")
-    task_folder = os.path.join(TASKS_ROOT, slug)
+    task_folder = _task_folder(slug)
 
-    if not os.path.isdir(task_folder):
+    if not task_folder or not os.path.isdir(task_folder):
         flash("Task not found.", "error")
         return redirect(url_for("tasks"))
 
     if action == "delete":
         try:
             shutil.rmtree(task_folder)
+            with _ERROR_SCAN_LOCK:
+                _ERROR_SCAN_STATE.pop(slug, None)
             flash(f"Task '{slug}' deleted.", "success")
         except Exception as exc:
             flash(f"Failed to delete task: {exc}", "error")
@@ -886,16 +1019,24 @@ def task_action(slug):
         lock_path = os.path.join(task_folder, "lock")
         _clear_stale_lock(slug, task_folder)
         if os.path.exists(lock_path):
-            flash("Task is already running.", "error")
+            if tr.is_task_queued(slug):
+                flash("Task is already queued.", "error")
+            else:
+                flash("Task is already running.", "error")
             return redirect(url_for("tasks"))
 
         ensure_data_dirs(ensure_downloads=True)
         open(lock_path, "w").close()
 
-        t = threading.Thread(target=run_task_background, args=(task_folder,), daemon=True)
-        t.start()
+        queued = tr.runner_pool_busy()
+        if not tr.submit_background(task_folder, run_task_background):
+            flash("Task is already queued.", "error")
+            return redirect(url_for("tasks"))
 
-        flash("Task started in background. Check logs.txt for progress.", "success")
+        if queued:
+            flash("All task runners are busy; task queued and will start when one frees up.", "success")
+        else:
+            flash("Task started in background. Check logs.txt for progress.", "success")
         return redirect(url_for("tasks"))
 
     if action == "cancel":
@@ -923,6 +1064,8 @@ def task_action(slug):
                 # Resume process if it's running and was previously stopped
                 if _signal_task(slug, task_folder, signal.SIGCONT):
                     flash("Task unpaused and resumed.", "success")
+                elif tr.is_task_pending(slug):
+                    flash("Task unpaused; queued run will start normally.", "success")
                 else:
                     _clear_stale_lock(slug, task_folder)
                     flash("Task unpaused (no running process).", "success")
@@ -938,6 +1081,8 @@ def task_action(slug):
                 # Send SIGSTOP to running process if present
                 if _signal_task(slug, task_folder, signal.SIGSTOP):
                     flash("Task paused (process stopped).", "success")
+                elif tr.is_task_pending(slug):
+                    flash("Task paused; queued run will start stopped.", "success")
                 else:
                     _clear_stale_lock(slug, task_folder)
                     flash("Task paused (process not running).", "success")
@@ -959,10 +1104,8 @@ def task_logs(slug):
     Returns JSON with the log content from the current/latest run log.
     Per-run logs are stored in /tasks/<slug>/logs/run_YYYYMMDD_HHMMSS.log
     """
-    ensure_data_dirs(ensure_downloads=False)
-    
-    task_folder = os.path.join(TASKS_ROOT, slug)
-    if not os.path.isdir(task_folder):
+    task_folder = _task_folder(slug)
+    if not task_folder or not os.path.isdir(task_folder):
         return jsonify({"error": "Task not found"}), 404
     
     run_log_path = _latest_run_log_path(task_folder)
@@ -1000,10 +1143,8 @@ def task_errors(slug):
     Extract and return error lines from task logs (current run).
     Returns JSON with error lines and count from the latest run log.
     """
-    ensure_data_dirs(ensure_downloads=False)
-    
-    task_folder = os.path.join(TASKS_ROOT, slug)
-    if not os.path.isdir(task_folder):
+    task_folder = _task_folder(slug)
+    if not task_folder or not os.path.isdir(task_folder):
         return jsonify({"error": "Task not found"}), 404
     
     run_log_path = _latest_run_log_path(task_folder)
@@ -1012,34 +1153,19 @@ def task_errors(slug):
     artillery_config = load_artillery_config()
     max_error_lines = artillery_config.get("error_lines_display", 20)
     
-    error_lines = deque(maxlen=max_error_lines)  # Efficiently maintain last N lines
+    error_lines = []
     error_count = 0
 
-    error_re = re.compile(
-        r"\[\[error\]\]|\[error\]|^Traceback \(most recent call last\):|^[A-Z]\w*Error:",
-        re.IGNORECASE,
-    )
-    
     try:
         if run_log_path and os.path.exists(run_log_path):
-            with open(run_log_path, "r", encoding="utf-8", errors="replace") as f:
-                for raw_line in f:
-                    line = strip_ansi(raw_line)
-                    # Check for gallery-dl error tags: [[error]] or Python exceptions
-                    # Examples: [download][[error]] Failed to download...
-                    #           [error] message
-                    #           Traceback (most recent call last):
-                    if error_re.search(line):
-                        error_count += 1
-                        # Keep only the last configured error lines for display (max_error_lines)
-                        error_lines.append(line.rstrip())
+            error_count, error_lines = _scan_run_log_errors(slug, run_log_path, max_error_lines)
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
     
     return jsonify({
         "slug": slug, 
         "error_count": error_count, 
-        "error_lines": list(error_lines)
+        "error_lines": error_lines
     })
 
 
@@ -1049,18 +1175,16 @@ def task_runs(slug):
     List available per-run log files for a task.
     Returns JSON with list of run logs.
     """
-    ensure_data_dirs(ensure_downloads=False)
-    
-    task_folder = os.path.join(TASKS_ROOT, slug)
-    if not os.path.isdir(task_folder):
+    task_folder = _task_folder(slug)
+    if not task_folder or not os.path.isdir(task_folder):
         return jsonify({"error": "Task not found"}), 404
     
     logs_dir = os.path.join(task_folder, "logs")
     runs = []
 
-    if os.path.isdir(logs_dir):
-        try:
-            for entry in os.scandir(logs_dir):
+    try:
+        with os.scandir(logs_dir) as it:
+            for entry in it:
                 if not entry.is_file():
                     continue
                 filename = entry.name
@@ -1075,8 +1199,8 @@ def task_runs(slug):
                     "size": int(stat.st_size),
                     "mtime": float(stat.st_mtime),
                 })
-        except Exception:
-            pass
+    except Exception:
+        pass
 
     runs.sort(key=lambda r: r["filename"], reverse=True)
     
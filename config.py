@@ -176,6 +176,10 @@ class Config:
     media_wall_auto_refresh_on_task_end: bool
     media_wall_min_refresh_seconds: int
     
+    # Task runners
+    task_runner_workers: int
+    run_log_retention: int
+    
     # Gallery-dl config
     default_config_url: str
     
@@ -224,6 +228,12 @@ class Config:
         hang_dump_seconds = _validate_int(
             "ARTILLERY_HANG_DUMP_SECONDS", 0, min_val=0
         )
+        task_runner_workers = _validate_int(
+            "TASK_RUNNER_WORKERS", 8, min_val=1
+        )
+        run_log_retention = _validate_int(
+            "RUN_LOG_RETENTION", 0, min_val=0
+        )
         
         config = cls(
             tasks_dir=tasks_dir,
@@ -248,6 +258,8 @@ class Config:
                 "MEDIA_WALL_AUTO_REFRESH_ON_TASK_END", True
             ),
             media_wall_min_refresh_seconds=media_wall_min_refresh,
+            task_runner_workers=task_runner_workers,
+            run_log_retention=run_log_retention,
             default_config_url=os.environ.get(
                 "GALLERYDL_DEFAULT_CONFIG_URL",
                 "https://raw.githubusercontent.com/mikf/gallery-dl/master/docs/gallery-dl.conf",
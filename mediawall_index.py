@@ -163,13 +163,16 @@ def refresh_cache(
 
 
 def list_cached_files(cache_dir: str, *, limit: int = 60) -> List[str]:
-    if not os.path.isdir(cache_dir):
-        return []
     files = []
-    for fn in os.listdir(cache_dir):
-        ext = os.path.splitext(fn)[1].lower()
-        if ext in MEDIA_EXTS and not fn.endswith(".tmp"):
-            files.append(fn)
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                fn = entry.name
+                ext = os.path.splitext(fn)[1].lower()
+                if ext in MEDIA_EXTS and not fn.endswith(".tmp") and entry.is_file():
+                    files.append(fn)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
     # random-ish order not required; your template rows already shuffle via refresh
     files.sort()
     return files[:limit]
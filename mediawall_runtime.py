@@ -4,6 +4,7 @@ import shutil
 import threading
 import datetime as dt
 import hashlib
+import functools
 from typing import Optional, Tuple, Dict, Set
 
 IMAGE_EXTS: Set[str] = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
@@ -69,15 +70,23 @@ def open_db(db_path: str = MEDIA_DB) -> sqlite3.Connection:
     return conn
 
 
+@functools.lru_cache(maxsize=8)
+def _downloads_prefixes(downloads_root: str) -> Tuple[str, str]:
+    # Normalised root and its "/"-terminated prefix; computed once per root
+    # rather than once per ingested log line.
+    dr = downloads_root.replace("\\", "/").rstrip("/")
+    return dr, dr + "/"
+
+
 def extract_relpath_from_log_line(line: str, downloads_root: str = DOWNLOADS_ROOT) -> Optional[str]:
     s = line.strip()
     if not s:
         return None
 
     s = s.replace("\\", "/")
-    dr = downloads_root.replace("\\", "/").rstrip("/")
+    dr, dr_prefix = _downloads_prefixes(downloads_root)
 
-    if not (s == dr or s.startswith(dr + "/")):
+    if not (s == dr or s.startswith(dr_prefix)):
         return None
 
     rel = s[len(dr) :].lstrip("/")
@@ -192,13 +201,12 @@ def ingest_all_task_logs(
     matched_total = 0
     inserted_total = 0
 
-    if not os.path.isdir(tasks_root):
-        return {"tasks_seen": 0, "matched": 0, "inserted": 0}
-
     try:
-        entries = list(os.scandir(tasks_root))
+        with os.scandir(tasks_root) as it:
+            entries = list(it)
     except Exception:
-        # If directory scan fails, continue with no tasks; indexing is non-fatal.
+        # If directory scan fails (including a missing tasks_root), continue with
+        # no tasks; indexing is non-fatal.
         entries = []
 
     for entry in sorted(entries, key=lambda e: e.name):
@@ -3,6 +3,7 @@ from datetime import datetime
 
 from croniter import croniter
 
+from config import _validate_int
 from task_runtime import ensure_data_dirs, TASKS_ROOT, read_text, run_task_background
 
 
@@ -23,12 +24,11 @@ def should_run_now(cron_expr: str, now: datetime) -> bool:
 def main():
     ensure_data_dirs()
     now = datetime.now()
-
-    if not os.path.isdir(TASKS_ROOT):
-        return
+    run_log_retention = _validate_int("RUN_LOG_RETENTION", 0, min_val=0)
 
     try:
-        entries = list(os.scandir(TASKS_ROOT))
+        with os.scandir(TASKS_ROOT) as it:
+            entries = list(it)
     except Exception:
         entries = []
 
@@ -62,7 +62,7 @@ def main():
                 pass
         except FileExistsError:
             continue
-        run_task_background(task_folder)
+        run_task_background(task_folder, run_log_retention=run_log_retention)
 
 
 if __name__ == "__main__":
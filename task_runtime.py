@@ -1,4 +1,6 @@
 import os
+import atexit
+import queue
 import shlex
 import shutil
 import subprocess
@@ -7,7 +9,7 @@ import time
 import datetime as dt
 import logging
 import signal
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import mediawall_runtime as mw
 
@@ -23,6 +25,27 @@ CONFIG_FILE = os.path.join(CONFIG_ROOT, "gallery-dl.conf")
 RUNNING_PROCS: Dict[str, subprocess.Popen] = {}
 RUNNING_PROCS_LOCK = threading.Lock()
 
+# Background task runs (UI-triggered) are drained from _TASK_QUEUE by a fixed
+# set of daemon worker threads, started on first use. This caps how many
+# downloads run at once without a thread per run, and, like the old per-run
+# daemon threads, never makes interpreter shutdown wait for gallery-dl.
+TASK_RUNNER_WORKERS = 8  # app.py sets the validated value via configure_task_runner()
+_TASK_QUEUE: "queue.Queue" = queue.Queue()
+_TASK_WORKERS: List[threading.Thread] = []
+_TASK_WORKERS_LOCK = threading.Lock()
+
+# Set at interpreter exit so workers stop picking up queued runs.
+_SHUTTING_DOWN = threading.Event()
+atexit.register(_SHUTTING_DOWN.set)
+
+# Queued runs that have no process yet: slug -> "queued" (waiting for a
+# worker), "starting" (worker picked it up, Popen pending) or "canceled"
+# (canceled while starting; the worker will not spawn it).
+# These hold a lock file but no pid, so they must not be treated as stale.
+# Guarded by RUNNING_PROCS_LOCK, together with the in-flight run count.
+PENDING_RUNS: Dict[str, str] = {}
+_RUNS_INFLIGHT = 0
+
 
 def ensure_data_dirs(*, ensure_downloads: bool = False):
     os.makedirs(TASKS_ROOT, exist_ok=True)
@@ -35,10 +58,11 @@ def ensure_data_dirs(*, ensure_downloads: bool = False):
 
 
 def read_text(path: str, *, strip: bool = True) -> Optional[str]:
-    if not os.path.exists(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            data = f.read()
+    except FileNotFoundError:
         return None
-    with open(path, "r", encoding="utf-8", errors="replace") as f:
-        data = f.read()
     if strip:
         data = data.strip()
     return data or None
@@ -69,14 +93,32 @@ def write_text(path: str, content: str):
 
 
 def _get_proc_for_task(slug: str) -> Optional[subprocess.Popen]:
-    with RUNNING_PROCS_LOCK:
-        proc = RUNNING_PROCS.get(slug)
-        if proc and proc.poll() is None:
-            return proc
+    # Single dict.get is atomic under the GIL; RUNNING_PROCS_LOCK only guards
+    # mutations. Polling outside the lock keeps waitpid() off the critical section.
+    proc = RUNNING_PROCS.get(slug)
+    if proc and proc.poll() is None:
+        return proc
     return None
 
 
+def is_task_pending(slug: str) -> bool:
+    """True while a pool-submitted run for slug has not spawned its process yet."""
+    return slug in PENDING_RUNS
+
+
+def is_task_queued(slug: str) -> bool:
+    """True while a pool-submitted run for slug is still waiting for a worker."""
+    return PENDING_RUNS.get(slug) == "queued"
+
+
+def runner_pool_busy() -> bool:
+    """True if a newly submitted run would have to wait for a free worker."""
+    return _RUNS_INFLIGHT >= TASK_RUNNER_WORKERS
+
+
 def _get_pid_for_task(slug: str, task_folder: str) -> Optional[int]:
+    # Pending runs (see PENDING_RUNS) have no pid yet; callers that decide
+    # staleness must check is_task_pending() before trusting a None here.
     proc = _get_proc_for_task(slug)
     if proc is not None:
         return proc.pid
@@ -126,6 +168,8 @@ def clear_stale_lock(slug: str, task_folder: str):
     lock_path = os.path.join(task_folder, "lock")
     if not os.path.exists(lock_path):
         return
+    if is_task_pending(slug):
+        return
     pid = _get_pid_for_task(slug, task_folder)
     if not pid:
         cleanup_task_state(slug, task_folder)
@@ -137,11 +181,27 @@ def clear_stale_lock(slug: str, task_folder: str):
 
 
 def kill_task(slug: str, task_folder: str) -> bool:
+    # A run without a process yet is canceled through the registry: a queued
+    # run is dropped and never picked up; a starting run is marked canceled,
+    # which run_task_background() checks under the same lock it spawns under.
+    with RUNNING_PROCS_LOCK:
+        state = PENDING_RUNS.get(slug)
+        if state == "queued":
+            PENDING_RUNS.pop(slug, None)
+        elif state == "starting":
+            PENDING_RUNS[slug] = "canceled"
+    if state is not None:
+        cleanup_task_state(slug, task_folder)
+        return True
+
     proc = _get_proc_for_task(slug)
     pid = _get_pid_for_task(slug, task_folder)
     if not pid:
+        # Lock already gone: the run ended (e.g. exited early before spawning)
+        # between the caller's check and now, which is as good as canceled.
+        ended = not os.path.exists(os.path.join(task_folder, "lock"))
         cleanup_task_state(slug, task_folder)
-        return False
+        return ended
 
     for sig, wait_s in ((signal.SIGINT, 1.5), (signal.SIGTERM, 1.5), (signal.SIGKILL, 0.5)):
         try:
@@ -167,9 +227,112 @@ def kill_task(slug: str, task_folder: str) -> bool:
     return False
 
 
-def _utcnow() -> str:
+def prune_run_logs(logs_dir: str, keep: int) -> int:
+    """Delete all but the newest `keep` run logs in logs_dir (0 keeps all); returns count removed."""
+    if keep <= 0:
+        return 0
+    try:
+        with os.scandir(logs_dir) as it:
+            names = sorted(
+                e.name for e in it
+                if e.name.startswith("run_") and e.name.endswith(".log") and e.is_file()
+            )
+    except OSError:
+        return 0
+
+    removed = 0
+    for name in names[:-keep]:
+        path = os.path.join(logs_dir, name)
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError as exc:
+            logger.debug("Failed to prune run log %s: %s", path, exc)
+    return removed
+
+
+def _task_slug(task_folder: str) -> str:
+    return os.path.basename(task_folder.rstrip("/"))
+
+
+def _run_pending(task_folder: str, fn, kwargs):
+    global _RUNS_INFLIGHT
+    slug = _task_slug(task_folder)
+    try:
+        with RUNNING_PROCS_LOCK:
+            state = PENDING_RUNS.get(slug)
+            if state != "queued":
+                # Canceled while queued.
+                return
+            if _SHUTTING_DOWN.is_set():
+                PENDING_RUNS.pop(slug, None)
+            else:
+                PENDING_RUNS[slug] = "starting"
+        if _SHUTTING_DOWN.is_set():
+            # Never start a queued run mid-shutdown; drop its lock so the task
+            # doesn't look running after a restart.
+            cleanup_task_state(slug, task_folder)
+            return
+        fn(task_folder, **kwargs)
+    except Exception as exc:
+        logger.error("Background task run failed for %s: %s", slug, exc, exc_info=exc)
+    finally:
+        with RUNNING_PROCS_LOCK:
+            _RUNS_INFLIGHT -= 1
+            # Only drop our own entry; a newer run may already be queued.
+            if PENDING_RUNS.get(slug) in ("starting", "canceled"):
+                PENDING_RUNS.pop(slug, None)
+
+
+def _task_worker():
+    while True:
+        task_folder, fn, kwargs = _TASK_QUEUE.get()
+        try:
+            _run_pending(task_folder, fn, kwargs)
+        finally:
+            _TASK_QUEUE.task_done()
+
+
+def _ensure_task_workers():
+    with _TASK_WORKERS_LOCK:
+        while len(_TASK_WORKERS) < TASK_RUNNER_WORKERS:
+            t = threading.Thread(
+                target=_task_worker,
+                name=f"artillery-task-{len(_TASK_WORKERS)}",
+                daemon=True,
+            )
+            t.start()
+            _TASK_WORKERS.append(t)
+
+
+def configure_task_runner(*, workers: int):
+    """Set the task runner worker count; call before the first submit_background()."""
+    global TASK_RUNNER_WORKERS
+    TASK_RUNNER_WORKERS = max(1, int(workers))
+
+
+def submit_background(task_folder: str, fn=None, **kwargs) -> bool:
+    """Queue fn(task_folder, **kwargs) (default run_task_background) on the task runners.
+
+    Returns False if a run for this task is already pending.
+    """
+    global _RUNS_INFLIGHT
+    slug = _task_slug(task_folder)
+    with RUNNING_PROCS_LOCK:
+        if slug in PENDING_RUNS:
+            return False
+        PENDING_RUNS[slug] = "queued"
+        _RUNS_INFLIGHT += 1
+    _ensure_task_workers()
+    _TASK_QUEUE.put((task_folder, fn or run_task_background, kwargs))
+    return True
+
+
+def _utcnow(now: Optional[dt.datetime] = None) -> str:
+    if now is None:
+        now = dt.datetime.now(dt.timezone.utc)
     return (
-        dt.datetime.now(dt.timezone.utc)
+        now
         .isoformat(timespec="seconds")
         .replace("+00:00", "")
         + "Z"
@@ -184,6 +347,7 @@ def run_task_background(
     media_wall_copy_limit: int = 100,
     media_wall_auto_ingest: bool = True,
     media_wall_auto_refresh: bool = True,
+    run_log_retention: int = 0,
 ):
     ensure_data_dirs(ensure_downloads=True)
 
@@ -193,7 +357,11 @@ def run_task_background(
     command_path = os.path.join(task_folder, "command.txt")
     urls_file = os.path.join(task_folder, "urls.txt")
     pid_path = os.path.join(task_folder, "pid")
-    slug = os.path.basename(task_folder.rstrip("/"))
+    slug = _task_slug(task_folder)
+
+    # Lock removed while this run was still queued (e.g. canceled): skip it.
+    if not os.path.exists(lock_path):
+        return
 
     logs_dir = os.path.join(task_folder, "logs")
     os.makedirs(logs_dir, exist_ok=True)
@@ -221,8 +389,10 @@ def run_task_background(
             pass
         return
 
-    now = _utcnow()
-    timestamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%d_%H%M%S")
+    # One clock read so the run header and run log filename always agree.
+    started = dt.datetime.now(dt.timezone.utc)
+    now = _utcnow(started)
+    timestamp = started.strftime("%Y%m%d_%H%M%S")
     run_log_path = os.path.join(logs_dir, f"run_{timestamp}.log")
 
     try:
@@ -259,25 +429,44 @@ def run_task_background(
             run_logf.write(header)
             run_logf.flush()
 
-            proc = subprocess.Popen(
-                cmd_parts,
-                cwd=task_folder,
-                stdout=run_logf,
-                stderr=subprocess.STDOUT,
-                text=True,
-                env=env,
-                start_new_session=True,
-            )
+            # Spawn and register under the lock so kill_task() either marks this
+            # run canceled before it spawns or finds the process afterwards.
+            with RUNNING_PROCS_LOCK:
+                if PENDING_RUNS.get(slug) != "canceled":
+                    # Keep this free of preexec_fn: with only argv/cwd/env/start_new_session
+                    # CPython can spawn via vfork() instead of copying our page tables.
+                    proc = subprocess.Popen(
+                        cmd_parts,
+                        cwd=task_folder,
+                        stdout=run_logf,
+                        stderr=subprocess.STDOUT,
+                        text=True,
+                        env=env,
+                        start_new_session=True,
+                    )
+                    RUNNING_PROCS[slug] = proc
+                    if PENDING_RUNS.get(slug) == "starting":
+                        PENDING_RUNS.pop(slug, None)
+
+        if proc is None:
+            for path in (run_log_path, logs_path):
+                with open(path, "a", encoding="utf-8") as logf:
+                    logf.write("\nRun canceled before start.\n")
+            return
 
-        if proc is not None:
+        try:
+            write_text(pid_path, str(proc.pid))
+        except Exception as exc:
+            logger.debug("Failed to write PID file %s for task %s: %s", pid_path, slug, exc)
+
+        # Paused while queued: start halted so unpause (SIGCONT) resumes it.
+        if os.path.exists(os.path.join(task_folder, "paused")):
             try:
-                write_text(pid_path, str(proc.pid))
+                os.killpg(proc.pid, signal.SIGSTOP)
             except Exception as exc:
-                logger.debug("Failed to write PID file %s for task %s: %s", pid_path, slug, exc)
-            with RUNNING_PROCS_LOCK:
-                RUNNING_PROCS[slug] = proc
+                logger.warning("Failed to stop paused task %s: %s", slug, exc)
 
-        returncode = proc.wait() if proc is not None else -1
+        returncode = proc.wait()
         write_text(last_run_path, now)
 
         if returncode == 0:
@@ -290,10 +479,12 @@ def run_task_background(
         with open(run_log_path, "a", encoding="utf-8") as run_logf:
             run_logf.write(footer)
 
-        with open(logs_path, "a", encoding="utf-8") as logf:
-            with open(run_log_path, "r", encoding="utf-8", errors="replace") as run_logf:
+        # Copy raw bytes: no decode/re-encode of the whole run output, and
+        # multi-byte characters are never split across chunk boundaries.
+        with open(logs_path, "ab") as logf:
+            with open(run_log_path, "rb") as run_logf:
                 for line in run_logf:
-                    if line.startswith("$ "):
+                    if line.startswith(b"$ "):
                         break
                 shutil.copyfileobj(run_logf, logf)
 
@@ -317,6 +508,8 @@ def run_task_background(
             # Best-effort PID file cleanup in finally block; failure is non-fatal.
             pass
 
+        prune_run_logs(logs_dir, run_log_retention)
+
         if media_wall_enabled and media_wall_auto_ingest:
             try:
                 conn = mw.open_db(mw.MEDIA_DB)